@@ -1,13 +1,23 @@
 import uvicorn
 import os, json
+import asyncio
 import time as time_module
 import logging
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Annotated
 from fastapi import Depends, FastAPI, HTTPException, Request, status, Body
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
-from sqlalchemy import create_engine
-from sqlalchemy.orm import Session, sessionmaker
+from fastapi.responses import JSONResponse, ORJSONResponse, StreamingResponse
+import orjson
+from sqlalchemy import bindparam, delete, event, func, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
+from fastapi_cache import FastAPICache
+from fastapi_cache.backends.inmemory import InMemoryBackend
+from fastapi_cache.backends.redis import RedisBackend
+from fastapi_cache.decorator import cache
+from redis import asyncio as aioredis
 from pydantic_classes import *
 from sql_alchemy import *
 
@@ -22,22 +32,170 @@ logger = logging.getLogger(__name__)
 ############################################
 
 def init_db():
-    SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./data/Class_Diagram.db")
+    SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///./data/Class_Diagram.db")
     # Ensure local SQLite directory exists (safe no-op for other DBs)
     os.makedirs("data", exist_ok=True)
-    engine = create_engine(
-        SQLALCHEMY_DATABASE_URL, 
+    # SQLite serializes writers, so one writer connection plus a wide
+    # autocommit reader pool keeps readers off the write lock under WAL
+    writer_engine = create_async_engine(
+        SQLALCHEMY_DATABASE_URL,
+        connect_args={"check_same_thread": False},
+        pool_size=1,
+        max_overflow=0,
+        pool_pre_ping=True,
+        echo=False
+    )
+    reader_engine = create_async_engine(
+        SQLALCHEMY_DATABASE_URL,
         connect_args={"check_same_thread": False},
         pool_size=10,
         max_overflow=20,
         pool_pre_ping=True,
+        isolation_level="AUTOCOMMIT",
         echo=False
     )
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    Base.metadata.create_all(bind=engine)
-    return SessionLocal
+    SessionLocal = async_sessionmaker(writer_engine, autoflush=False, expire_on_commit=False)
+    ReadSessionLocal = async_sessionmaker(reader_engine, autoflush=False, expire_on_commit=False)
+
+    if SQLALCHEMY_DATABASE_URL.startswith("sqlite"):
+        @event.listens_for(writer_engine.sync_engine, "connect")
+        def set_sqlite_pragmas(dbapi_conn, connection_record):
+            """Tune each new SQLite connection: WAL lets readers run during
+            writes, NORMAL drops the per-commit fsync, the rest cut syscalls."""
+            cursor = dbapi_conn.cursor()
+            for pragma in (
+                "journal_mode=WAL",
+                "synchronous=NORMAL",
+                "mmap_size=268435456",
+                "cache_size=-65536",
+                "temp_store=MEMORY",
+            ):
+                cursor.execute(f"PRAGMA {pragma}")
+            cursor.close()
+
+    return writer_engine, reader_engine, SessionLocal, ReadSessionLocal
+
+
+class InsertBatcher:
+    """Coalesce concurrent single-row User inserts into one batched INSERT.
+
+    Callers enqueue a payload via submit() and await a future; a single
+    consumer task drains up to max_batch items (or whatever arrives within
+    max_wait_ms) and commits them in one transaction, amortizing the
+    per-commit fsync across the batch. If a batch fails, its rows are
+    retried one by one so a single bad row only fails its own request.
+    """
+
+    def __init__(self, session_factory, max_batch: int = 128, max_wait_ms: int = 5):
+        self.session_factory = session_factory
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._consume())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, payload: dict) -> dict:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((payload, future))
+        return await future
+
+    async def _consume(self):
+        while True:
+            batch = [await self.queue.get()]
+            deadline = asyncio.get_running_loop().time() + self.max_wait
+            while len(batch) < self.max_batch:
+                remaining = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._flush(batch)
+            except Exception:
+                # A batch must never kill the consumer; pending creates
+                # would otherwise block forever on unresolved futures
+                logger.exception("Insert batch flush failed")
+
+    async def _flush(self, batch):
+        try:
+            async with self.session_factory() as session:
+                await session.execute(insert(User), [payload for payload, _ in batch])
+                await session.commit()
+        except Exception:
+            await self._flush_one_by_one(batch)
+            return
+        for payload, future in batch:
+            if not future.done():
+                future.set_result(payload)
+
+    async def _flush_one_by_one(self, batch):
+        for payload, future in batch:
+            if future.done():
+                continue
+            try:
+                async with self.session_factory() as session:
+                    await session.execute(insert(User), [payload])
+                    await session.commit()
+                # The submitter may have been cancelled (client disconnect)
+                # while we were committing; re-check before resolving
+                if not future.done():
+                    future.set_result(payload)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Create tables on startup and dispose of the engine on shutdown."""
+    async with writer_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    redis = None
+    redis_url = os.getenv("REDIS_URL")
+    if redis_url:
+        redis = aioredis.from_url(redis_url)
+        FastAPICache.init(RedisBackend(redis), prefix="cd-api")
+    else:
+        # No Redis configured (e.g. the Render deployment): cache per
+        # process rather than logging a connection warning on every hit
+        FastAPICache.init(InMemoryBackend(), prefix="cd-api")
+    batcher.start()
+    yield
+    await batcher.stop()
+    if redis is not None:
+        await redis.close()
+    await reader_engine.dispose()
+    await writer_engine.dispose()
+
+
+def endpoint_key_builder(func, namespace="", *, request=None, response=None, args=(), kwargs=None):
+    """Cache key per endpoint; the injected DB session is not a stable key part."""
+    return f"{namespace}:{func.__name__}"
+
+
+async def invalidate_cache():
+    """Drop cached responses after a write so reads don't serve stale counts."""
+    try:
+        await FastAPICache.clear()
+    except Exception:
+        logger.warning("Failed to clear response cache", exc_info=True)
 
 app = FastAPI(
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
     title="Class_Diagram API",
     description="Auto-generated REST API with full CRUD operations, relationship management, and advanced features",
     version="1.0.0",
@@ -49,39 +207,73 @@ app = FastAPI(
     ]
 )
 
-# Enable CORS for all origins (for development)
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Or restrict to ["http://localhost:3000"]
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
 ############################################
 #
 #   Middleware
 #
 ############################################
 
-# Request logging middleware
+# Request-scoped session storage; sessions are created lazily by the
+# get_db/get_db_read dependencies and closed by DBSessionMiddleware, so
+# call sites within one request share a single session per pool
+db_ctx: ContextVar = ContextVar("db_session", default=None)
+db_read_ctx: ContextVar = ContextVar("db_read_session", default=None)
+
+
+class DBSessionMiddleware:
+    """Scope DB sessions to the request and close them once it finishes.
+
+    Pure ASGI middleware registered first (innermost) on purpose: it must
+    share a context with the route handlers, and any BaseHTTPMiddleware
+    between it and the router would run them in a child task whose
+    contextvar writes never reach our cleanup.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        write_token = db_ctx.set(None)
+        read_token = db_read_ctx.set(None)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            for ctx, token in ((db_ctx, write_token), (db_read_ctx, read_token)):
+                session = ctx.get()
+                if session is not None:
+                    await session.close()
+                ctx.reset(token)
+
+
+app.add_middleware(DBSessionMiddleware)
+
+# Request logging middleware (debug only; two log calls per request are
+# not free on the hot path)
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    """Log all incoming requests and responses."""
-    logger.info(f"Incoming request: {request.method} {request.url.path}")
+    """Log incoming requests and responses when debug logging is enabled."""
+    if not logger.isEnabledFor(logging.DEBUG):
+        return await call_next(request)
+    if request.method == "OPTIONS":
+        return await call_next(request)
+    logger.debug(f"Incoming request: {request.method} {request.url.path}")
     response = await call_next(request)
-    logger.info(f"Response status: {response.status_code}")
+    logger.debug(f"Response status: {response.status_code}")
     return response
 
-# Request timing middleware
-@app.middleware("http")
-async def add_process_time_header(request: Request, call_next):
-    """Add processing time header to all responses."""
-    start_time = time_module.time()
-    response = await call_next(request)
-    process_time = time_module.time() - start_time
-    response.headers["X-Process-Time"] = str(process_time)
-    return response
+# Request timing middleware, attached only when profiling is requested
+if os.getenv("PROFILE"):
+    @app.middleware("http")
+    async def add_process_time_header(request: Request, call_next):
+        """Add processing time header (milliseconds) to all responses."""
+        start_time = time_module.perf_counter_ns()
+        response = await call_next(request)
+        elapsed_ns = time_module.perf_counter_ns() - start_time
+        response.headers["X-Process-Time"] = f"{elapsed_ns / 1_000_000:.2f}"
+        return response
 
 ############################################
 #
@@ -147,19 +339,53 @@ async def http_exception_handler(request: Request, exc: HTTPException):
         }
     )
 
-# Initialize database session
-SessionLocal = init_db()
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
+# Initialize database sessions (writer for mutations, reader for GETs)
+writer_engine, reader_engine, SessionLocal, ReadSessionLocal = init_db()
+# Micro-batcher for single-row inserts; started/stopped by the lifespan
+batcher = InsertBatcher(SessionLocal, max_batch=128, max_wait_ms=5)
+
+# Prebuilt statement for hot single-row lookups; avoids re-constructing
+# the clause tree on every request
+_USER_BY_ID = select(User).where(User.id == bindparam("uid"))
+# Enable CORS for all origins (for development). Registered after the other
+# middlewares so it runs outermost and answers preflight OPTIONS requests
+# before they enter the logging/session stack.
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["*"],  # Or restrict to ["http://localhost:3000"]
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
+
+# Dependency to get DB session (writer)
+async def get_db():
+    db = db_ctx.get()
+    if db is None:
+        db = SessionLocal()
+        db_ctx.set(db)
     try:
         yield db
     except Exception:
-        db.rollback()
+        await db.rollback()
         logger.error("Database session rollback due to exception")
         raise
-    finally:
-        db.close()
+
+
+# Dependency to get a read-only DB session from the autocommit reader pool
+async def get_db_read():
+    db = db_read_ctx.get()
+    if db is None:
+        db = ReadSessionLocal()
+        db_read_ctx.set(db)
+    yield db
+
+
+# Annotated aliases so FastAPI resolves each dependency from one shared
+# declaration instead of a fresh Depends() default per signature
+DB = Annotated[AsyncSession, Depends(get_db)]
+ReadDB = Annotated[AsyncSession, Depends(get_db_read)]
 
 ############################################
 #
@@ -189,11 +415,15 @@ def health_check():
 
 
 @app.get("/statistics", tags=["System"])
-def get_statistics(database: Session = Depends(get_db)):
+@cache(expire=60, key_builder=endpoint_key_builder)
+async def get_statistics(database: ReadDB):
     """Get database statistics for all entities"""
-    stats = {}
-    stats["user_count"] = database.query(User).count()
-    stats["total_entities"] = sum(stats.values())
+    # One query returns an (entity, count) row per table; chain
+    # union_all() onto this select as new entity tables are added
+    stmt = select(literal("user").label("entity"), func.count(User.id).label("count"))
+    rows = (await database.execute(stmt)).all()
+    stats = {f"{row.entity}_count": row.count for row in rows}
+    stats["total_entities"] = sum(row.count for row in rows)
     return stats
 
 ############################################
@@ -202,25 +432,45 @@ def get_statistics(database: Session = Depends(get_db)):
 #
 ############################################
 
-@app.get("/user/", response_model=None, tags=["User"])
-def get_all_user(detailed: bool = False, database: Session = Depends(get_db)) -> list:
-    from sqlalchemy.orm import joinedload
-    
-    return database.query(User).all()
+@app.get("/user/", response_model=list[UserRead], tags=["User"])
+async def get_all_user(database: ReadDB, detailed: bool = False):
+    # Stream rows in 1000-row chunks instead of materializing the whole
+    # table; memory stays constant and the first bytes go out immediately
+    result = await database.stream(select(User).execution_options(yield_per=1000))
+
+    async def generate():
+        yield b"["
+        first = True
+        async for db_user in result.scalars():
+            if not first:
+                yield b","
+            first = False
+            yield orjson.dumps(UserRead.model_validate(db_user).model_dump())
+        yield b"]"
+
+    return StreamingResponse(generate(), media_type="application/json")
 
 
 @app.get("/user/count/", response_model=None, tags=["User"])
-def get_count_user(database: Session = Depends(get_db)) -> dict:
+@cache(expire=60, key_builder=endpoint_key_builder)
+async def get_count_user(database: ReadDB) -> dict:
     """Get the total count of User entities"""
-    count = database.query(User).count()
+    count = await database.scalar(select(func.count()).select_from(User))
     return {"count": count}
 
 
 @app.get("/user/paginated/", response_model=None, tags=["User"])
-def get_paginated_user(skip: int = 0, limit: int = 100, detailed: bool = False, database: Session = Depends(get_db)) -> dict:
+async def get_paginated_user(database: ReadDB, skip: int = 0, limit: int = 100, detailed: bool = False) -> dict:
     """Get paginated list of User entities"""
-    total = database.query(User).count()
-    user_list = database.query(User).offset(skip).limit(limit).all()
+    # Window function folds the COUNT(*) into the page query itself
+    stmt = select(User, func.count().over().label("total")).offset(skip).limit(limit)
+    rows = (await database.execute(stmt)).all()
+    if rows:
+        total = rows[0].total
+    else:
+        # Page past the end (or empty table): fall back to a plain count
+        total = await database.scalar(select(func.count()).select_from(User))
+    user_list = [row[0] for row in rows]
     return {
         "total": total,
         "skip": skip,
@@ -230,70 +480,59 @@ def get_paginated_user(skip: int = 0, limit: int = 100, detailed: bool = False,
 
 
 @app.get("/user/search/", response_model=None, tags=["User"])
-def search_user(
-    database: Session = Depends(get_db)
+async def search_user(
+    database: ReadDB
 ) -> list:
     """Search User entities by attributes"""
-    query = database.query(User)
-    
-    
-    results = query.all()
-    return results
+    query = select(User)
 
 
-@app.get("/user/{user_id}/", response_model=None, tags=["User"])
-async def get_user(user_id: int, database: Session = Depends(get_db)) -> User:
-    db_user = database.query(User).filter(User.id == user_id).first()
-    if db_user is None:
-        raise HTTPException(status_code=404, detail="User not found")
+    results = await database.execute(query)
+    return list(results.scalars())
 
-    response_data = {
-        "user": db_user,
-}
-    return response_data
-
-
-
-@app.post("/user/", response_model=None, tags=["User"])
-async def create_user(user_data: UserCreate, database: Session = Depends(get_db)) -> User:
 
+@app.get("/user/{user_id}/", response_model=UserRead, tags=["User"])
+async def get_user(user_id: int, database: ReadDB):
+    db_user = (await database.execute(_USER_BY_ID, {"uid": user_id})).scalar_one_or_none()
+    if db_user is None:
+        raise HTTPException(status_code=404, detail="User not found")
 
-    db_user = User(
-        isActive=user_data.isActive,        username=user_data.username,        id=user_data.id,        dateOfBirth=user_data.dateOfBirth,        email=user_data.email        )
+    return db_user
 
-    database.add(db_user)
-    database.commit()
-    database.refresh(db_user)
 
 
+@app.post("/user/", response_model=UserRead, tags=["User"])
+async def create_user(user_data: UserCreate):
+    # Enqueue into the micro-batcher; the consumer commits us together
+    # with any other inserts that arrive within the batching window
+    await batcher.submit(user_data.model_dump())
+    await invalidate_cache()
 
-    
-    return db_user
+    return user_data
 
 
 @app.post("/user/bulk/", response_model=None, tags=["User"])
-async def bulk_create_user(items: list[UserCreate], database: Session = Depends(get_db)) -> dict:
+async def bulk_create_user(items: list[UserCreate], database: DB) -> dict:
     """Create multiple User entities at once"""
-    created_items = []
-    errors = []
-    
-    for idx, item_data in enumerate(items):
-        try:
-            # Basic validation for each item
-            
-            db_user = User(
-                isActive=item_data.isActive,                username=item_data.username,                id=item_data.id,                dateOfBirth=item_data.dateOfBirth,                email=item_data.email            )
-            database.add(db_user)
-            database.flush()  # Get ID without committing
-            created_items.append(db_user.id)
-        except Exception as e:
-            errors.append({"index": idx, "error": str(e)})
-    
-    if errors:
-        database.rollback()
-        raise HTTPException(status_code=400, detail={"message": "Bulk creation failed", "errors": errors})
-    
-    database.commit()
+    if not items:
+        return {
+            "created_count": 0,
+            "created_ids": [],
+            "message": "Successfully created 0 User entities"
+        }
+
+    # Single executemany INSERT instead of one ORM flush per row
+    payload = [item.model_dump() for item in items]
+    try:
+        result = await database.execute(insert(User).returning(User.id), payload)
+        created_items = list(result.scalars())
+    except (IntegrityError, SQLAlchemyError) as e:
+        await database.rollback()
+        error_detail = str(e.orig) if hasattr(e, 'orig') else str(e)
+        raise HTTPException(status_code=400, detail={"message": "Bulk creation failed", "errors": [{"error": error_detail}]})
+
+    await database.commit()
+    await invalidate_cache()
     return {
         "created_count": len(created_items),
         "created_ids": created_items,
@@ -302,51 +541,53 @@ async def bulk_create_user(items: list[UserCreate], database: Session = Depends(
 
 
 @app.delete("/user/bulk/", response_model=None, tags=["User"])
-async def bulk_delete_user(ids: list[int], database: Session = Depends(get_db)) -> dict:
+async def bulk_delete_user(ids: list[int], database: DB) -> dict:
     """Delete multiple User entities at once"""
+    # One SELECT to find missing ids, one DELETE for the rest
+    found = set((await database.execute(select(User.id).where(User.id.in_(ids)))).scalars())
+    not_found = [item_id for item_id in ids if item_id not in found]
+
     deleted_count = 0
-    not_found = []
-    
-    for item_id in ids:
-        db_user = database.query(User).filter(User.id == item_id).first()
-        if db_user:
-            database.delete(db_user)
-            deleted_count += 1
-        else:
-            not_found.append(item_id)
-    
-    database.commit()
-    
+    if found:
+        result = await database.execute(delete(User).where(User.id.in_(found)))
+        deleted_count = result.rowcount
+
+    await database.commit()
+    await invalidate_cache()
+
     return {
         "deleted_count": deleted_count,
         "not_found": not_found,
         "message": f"Successfully deleted {deleted_count} User entities"
     }
 
-@app.put("/user/{user_id}/", response_model=None, tags=["User"])
-async def update_user(user_id: int, user_data: UserCreate, database: Session = Depends(get_db)) -> User:
-    db_user = database.query(User).filter(User.id == user_id).first()
-    if db_user is None:
+@app.put("/user/{user_id}/", response_model=UserRead, tags=["User"])
+async def update_user(user_id: int, user_data: UserCreate, database: DB):
+    # Single UPDATE instead of SELECT + per-attribute setattr + refresh
+    stmt = (
+        update(User)
+        .where(User.id == user_id)
+        .values(**user_data.model_dump())
+        .execution_options(synchronize_session=False)
+    )
+    result = await database.execute(stmt)
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="User not found")
 
-    setattr(db_user, 'isActive', user_data.isActive)
-    setattr(db_user, 'username', user_data.username)
-    setattr(db_user, 'id', user_data.id)
-    setattr(db_user, 'dateOfBirth', user_data.dateOfBirth)
-    setattr(db_user, 'email', user_data.email)
-    database.commit()
-    database.refresh(db_user)
-    
-    return db_user
+    await database.commit()
+    await invalidate_cache()
+
+    return user_data
 
 
 @app.delete("/user/{user_id}/", response_model=None, tags=["User"])
-async def delete_user(user_id: int, database: Session = Depends(get_db)):
-    db_user = database.query(User).filter(User.id == user_id).first()
+async def delete_user(user_id: int, database: DB):
+    db_user = (await database.execute(_USER_BY_ID, {"uid": user_id})).scalar_one_or_none()
     if db_user is None:
         raise HTTPException(status_code=404, detail="User not found")
-    database.delete(db_user)
-    database.commit()
+    await database.delete(db_user)
+    await database.commit()
+    await invalidate_cache()
     return db_user
 
 
@@ -360,7 +601,15 @@ async def delete_user(user_id: int, database: Session = Depends(get_db)):
 ############################################
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
+    uvicorn.run(
+        "main_api:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=os.cpu_count(),
+        loop="uvloop",
+        http="httptools",
+        log_level="warning",
+    )
 
 
 
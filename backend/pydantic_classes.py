@@ -1,7 +1,7 @@
 from datetime import datetime, date, time
 from typing import List, Optional, Union, Set
 from enum import Enum
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, ConfigDict
 
 
 ############################################
@@ -12,6 +12,18 @@ from pydantic import BaseModel, field_validator
 # Classes are defined here
 ############################################
 class UserCreate(BaseModel):
+    model_config = ConfigDict(extra='forbid', frozen=True, str_strip_whitespace=True)
+
+    isActive: bool
+    username: str
+    id: int
+    dateOfBirth: date
+    email: str
+
+
+class UserRead(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     isActive: bool
     username: str
     id: int
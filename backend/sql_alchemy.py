@@ -1,7 +1,7 @@
 import enum
 from typing import List, Optional
 from sqlalchemy import (
-    create_engine, Column, ForeignKey, Table, Text, Boolean, String, Date, 
+    Column, ForeignKey, Table, Text, Boolean, String, Date,
     Time, DateTime, Float, Integer, Enum
 )
 from sqlalchemy.orm import (
@@ -20,15 +20,7 @@ class Base(DeclarativeBase):
 class User(Base):
     __tablename__ = "user"
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    username: Mapped[str] = mapped_column(String(100))
-    email: Mapped[str] = mapped_column(String(100))
+    username: Mapped[str] = mapped_column(String(100), index=True)
+    email: Mapped[str] = mapped_column(String(100), index=True, unique=True)
     dateOfBirth: Mapped[dt_date] = mapped_column(Date)
     isActive: Mapped[bool] = mapped_column(Boolean)
-
-
-# Database connection
-DATABASE_URL = "sqlite:///Class_Diagram.db"  # SQLite connection
-engine = create_engine(DATABASE_URL, echo=True)
-
-# Create tables in the database
-Base.metadata.create_all(engine, checkfirst=True)
\ No newline at end of file